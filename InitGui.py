@@ -73,7 +73,7 @@ class PartWorkbench ( Workbench ):
         import PartGui
         import Part
         try:
-            import JoinFeatures
+            import JoinFeaturesGui
         except ImportError:
             print "JoinFeatures module cannot be loaded"
         self.cmdListJoin = ["Part_EmbedFeature","Part_ConnectObjectsFeature"]
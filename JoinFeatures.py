@@ -22,49 +22,164 @@
 #***************************************************************************
 
 import FreeCAD, Part
-import JoinFeatures_rc
-
-if FreeCAD.GuiUp:
-    import FreeCADGui
-    from PySide import QtCore, QtGui
+import os, sys, time, json, hashlib, collections, contextlib, tempfile
+try:
+    import queue
+except ImportError:
+    import Queue as queue #Python 2
 
 __title__="JoinFeatures module"
 __author__ = "DeepSOIC"
 __url__ = "http://www.freecadweb.org"
 
-#-------------------------- translation-related code ----------------------------------------
-#Thanks, yorik! (see forum thread "A new Part tool is being born... JoinFeatures!"
-#http://forum.freecadweb.org/viewtopic.php?f=22&t=11112&start=30#p90239 )
-try:
-    _fromUtf8 = QtCore.QString.fromUtf8
-except AttributeError:
-    def _fromUtf8(s):
-        return s
-try:
-    _encoding = QtGui.QApplication.UnicodeUTF8
-    def _translate(context, text, disambig):
-        return QtGui.QApplication.translate(context, text, disambig, _encoding)
-except AttributeError:
-    def _translate(context, text, disambig):
-        return QtGui.QApplication.translate(context, text, disambig)
-#--------------------------/translation-related code ----------------------------------------
-
 # -------------------------- common stuff --------------------------------------------------
 def getParamRefine():
     return FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Part/Boolean").GetBool("RefineModel")
 
-def shapeOfMaxVol(compound):
+def getParamJoin():
+    return FreeCAD.ParamGet("User parameter:BaseApp/Preferences/Mod/Part/JoinFeatures")
+
+def getParamFuzzy():
+    return getParamJoin().GetFloat("Fuzzy", 0.0)
+
+def getParamParallel():
+    #only Connect with Boolean engine has independent booleans to run in parallel
+    return getParamJoin().GetBool("Parallel", False)
+
+def getParamCompactStorage():
+    return getParamJoin().GetBool("CompactStorage", False)
+
+def getParamParallelProcesses():
+    return getParamJoin().GetInt("ParallelProcesses", 0)
+
+def getParamAsync():
+    return getParamJoin().GetBool("Async", False)
+
+# -------------------------- instrumentation --------------------------------------------------
+def resetPeakMemory():
+    '''resetPeakMemory(): resets the peak resident memory of this process to
+    its current value. Returns False if it can't be done (only Linux is
+    supported).'''
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except (IOError, OSError):
+        return False
+    return True
+
+def getPeakMemory():
+    '''getPeakMemory(): returns peak resident memory of this process since the
+    last resetPeakMemory(), in kilobytes, or None if it can't be read.'''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+def measurePeakMemory(func, *args):
+    '''measurePeakMemory(func, *args): calls func(*args). Returns tuple (return
+    value, peak resident memory of the call in KB, or None if unknown).'''
+    measured = resetPeakMemory()
+    rst = func(*args)
+    return (rst, getPeakMemory() if measured else None)
+
+def shapeComplexity(shape):
+    return {'faces': len(shape.Faces),
+            'edges': len(shape.Edges),
+            'solids': len(shape.Solids)}
+
+class JoinStats(object):
+    '''JoinStats(): collects wall time per stage, shape complexity and peak
+    memory of a join recompute. Time of stages with the same name is summed,
+    peak memory is the largest. Peak memory of a stage is None where it
+    can't be measured (see resetPeakMemory). Stages must not be nested.'''
+    def __init__(self):
+        self.times = collections.OrderedDict()
+        self.peaks = collections.OrderedDict()
+        self.workersPeak = None
+        self.shapes = collections.OrderedDict()
+        self.onStage = None #callable(name), called when a stage begins
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.onStage is not None:
+            self.onStage(name)
+        measured = resetPeakMemory()
+        t = time.time()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.time() - t
+            peak = getPeakMemory() if measured else None
+            if peak is not None and self.peaks.get(name) is not None:
+                peak = max(peak, self.peaks[name])
+            self.peaks[name] = peak
+
+    def addWorkerPeak(self, peak):
+        '''Records peak memory of a worker process (see runBooleans).'''
+        if peak is not None:
+            self.workersPeak = max(self.workersPeak or 0, peak)
+
+    def addShape(self, label, shape):
+        self.shapes[label] = shapeComplexity(shape)
+
+    def merge(self, record):
+        '''Adds times and peaks of stages from record (asDict() of stats
+        collected in another process, e.g. a worker).'''
+        for name, t in record['times'].items():
+            self.times[name] = self.times.get(name, 0.0) + t
+        for name, peak in record['peakMemoryKB'].items():
+            if peak is not None and self.peaks.get(name) is not None:
+                peak = max(peak, self.peaks[name])
+            self.peaks[name] = peak
+        self.addWorkerPeak(record['workersPeakMemoryKB'])
+
+    def asDict(self):
+        return {'times': self.times,
+                'peakMemoryKB': self.peaks,
+                'workersPeakMemoryKB': self.workersPeak,
+                'shapes': self.shapes}
+
+@contextlib.contextmanager
+def _noStage():
+    yield
+
+def stage(stats, name):
+    '''stage(stats, name): context manager timing a stage into stats (a
+    JoinStats instance). Does nothing if stats is None.'''
+    if stats is None:
+        return _noStage()
+    return stats.stage(name)
+
+# -------------------------- /instrumentation --------------------------------------------------
+
+def shapeOfMaxVol(compound, vol_tolerance = 1e-8):
+    '''shapeOfMaxVol(compound, vol_tolerance = 1e-8): returns the child of compound
+    with the largest volume. Raises ValueError if the largest volume is shared
+    by more than one child (within vol_tolerance). Bounding box volumes are
+    used as upper bounds, so exact volumes are only computed for children
+    that can still be the largest.'''
     if compound.ShapeType == 'Compound':
+        children = []
+        for sh in compound.childShapes():
+            bb = sh.BoundBox
+            children.append((bb.XLength*bb.YLength*bb.ZLength, sh))
+        children.sort(key = lambda pair: pair[0], reverse = True)
         maxVol = 0
         cntEq = 0
         shMax = None
-        for sh in compound.childShapes():
+        for bbVol, sh in children:
+            if bbVol < maxVol - vol_tolerance:
+                break #this one and the rest can't reach maxVol
             v = sh.Volume
-            if v > maxVol + 1e-8 :
+            if v > maxVol + vol_tolerance :
                 maxVol = v
                 shMax = sh
                 cntEq = 1
-            elif abs(v - maxVol) <= 1e-8 :
+            elif abs(v - maxVol) <= vol_tolerance :
                 cntEq = cntEq + 1
         if cntEq > 1 :
             raise ValueError("Equal volumes, can't figure out what to cut off!")
@@ -72,15 +187,703 @@ def shapeOfMaxVol(compound):
     else:
         return compound
 
-def makePartJoinFeature(name, mode = 'bypass'):
-    '''makePartJoinFeature(name, mode = 'bypass'): makes an PartJoinFeature object.'''
-    obj = FreeCAD.ActiveDocument.addObject("Part::FeaturePython",name)
+def toolShapes(shape2):
+    '''toolShapes(shape2): returns shape2 as a list. shape2 can be a shape, or a
+    list of shapes (multi-tool join).'''
+    if isinstance(shape2, (list, tuple)):
+        return list(shape2)
+    return [shape2]
+
+def booleanOp(op, shape1, shape2, fuzzy = 0.0):
+    '''booleanOp(op, shape1, shape2, fuzzy = 0.0): returns shape1.<op>(shape2), where
+    op is 'cut', 'common', 'fuse', 'multiFuse' or 'generalFuse'. The fuzzy value
+    is only passed if it is non-zero, so that FreeCAD versions without fuzzy
+    booleans keep working.'''
+    method = getattr(shape1, op)
+    if fuzzy > 0:
+        return method(shape2, fuzzy)
+    return method(shape2)
+
+def _booleanWorker(job):
+    op, brep1, brep2, fuzzy = job
+    rst, peak = measurePeakMemory(booleanOp, op, shapeFromBrep(brep1), shapeFromBrep(brep2), fuzzy)
+    return (shapeToBrep(rst), peak)
+
+def getWorkerContext():
+    '''getWorkerContext(): returns multiprocessing context (or module, on Python
+    2) that starts worker processes by forking, or None if forking isn't
+    available (Windows) or not safe (macOS, where system frameworks of a
+    running GUI process don't survive a fork). Other start methods run
+    sys.executable, which in FreeCAD is FreeCAD itself, not a Python
+    interpreter.'''
+    if not hasattr(os, 'fork') or sys.platform == 'darwin':
+        return None
+    import multiprocessing
+    if not hasattr(multiprocessing, 'get_context'):
+        return multiprocessing #Python 2 always forks
+    try:
+        return multiprocessing.get_context('fork')
+    except ValueError:
+        return None
+
+def isAsyncAvailable():
+    return getWorkerContext() is not None
+
+def runBooleans(ops, fuzzy = 0.0, processes = 1, stats = None):
+    '''runBooleans(ops, fuzzy = 0.0, processes = 1, stats = None): runs independent boolean
+    operations. ops is a list of (op, shape1, shape2), see booleanOp. If
+    processes is not 1, they are run concurrently in that many worker
+    processes (0 = number of CPUs), if the platform can fork them (see
+    getWorkerContext). Peak memory of the workers is recorded into stats (a
+    JoinStats), if given. Returns list of results.'''
+    context = getWorkerContext()
+    if processes == 1 or len(ops) < 2 or context is None:
+        return [booleanOp(op, sh1, sh2, fuzzy) for op, sh1, sh2 in ops]
+    breps = {} #each shape is converted once, even if used by many operations
+    def brepOf(shape):
+        for sh in toolShapes(shape):
+            if id(sh) not in breps:
+                breps[id(sh)] = (sh, shapeToBrep(sh)) #keep sh, so that id stays unique
+        if isinstance(shape, (list, tuple)):
+            return [breps[id(sh)][1] for sh in shape]
+        return breps[id(shape)][1]
+    jobs = [(op, brepOf(sh1), brepOf(sh2), fuzzy) for op, sh1, sh2 in ops]
+    pool = context.Pool(processes or None)
+    try:
+        results = pool.map(_booleanWorker, jobs)
+    finally:
+        pool.close()
+        pool.join()
+    for brep, peak in results:
+        if stats is not None:
+            stats.addWorkerPeak(peak)
+    return [shapeFromBrep(brep) for brep, peak in results]
+
+def cutByTools(shape1, tools, fuzzy = 0.0):
+    if len(tools) == 1:
+        return booleanOp('cut', shape1, tools[0], fuzzy)
+    return booleanOp('cut', shape1, tools, fuzzy) #one multi-argument boolean
+
+def connectBoolean(shape1, shape2, vol_tolerance = 1e-8, stats = None, fuzzy = 0.0, processes = 1, intermediates = None):
+    '''connectBoolean(shape1, shape2, vol_tolerance = 1e-8, stats = None, fuzzy = 0.0, processes = 1, intermediates = None): Connect via separate cut, cut, common
+    and fuse. Each operation re-intersects the shapes. shape2 can be a list of shapes.
+    If processes is not 1, the cuts and commons are computed concurrently (see runBooleans).
+    intermediates is an optional dict of pieces shared with sibling features
+    (see getIntermediates); pieces found there are not recomputed, and
+    computed ones are put there.'''
+    tools = toolShapes(shape2)
+    store = intermediates if intermediates is not None else {}
+    need_cut1 = 'cut1' not in store
+    need_cuts2 = 'cuts2' not in store or 'commons' not in store
+    if processes != 1:
+        ops = []
+        if need_cut1:
+            ops.append(('cut', shape1, tools[0] if len(tools) == 1 else tools))
+        if need_cuts2:
+            for tool in tools:
+                ops.append(('cut', tool, shape1))
+                ops.append(('common', tool, shape1))
+        with stage(stats, 'parallelBooleans'):
+            results = runBooleans(ops, fuzzy, processes, stats)
+        if need_cut1:
+            store['cut1'] = results.pop(0)
+        if need_cuts2:
+            store['cuts2'] = results[0::2]
+            store['commons'] = results[1::2]
+    else:
+        if need_cut1:
+            with stage(stats, 'cut'):
+                store['cut1'] = cutByTools(shape1, tools, fuzzy)
+        if need_cuts2:
+            cuts2 = []
+            commons = []
+            for tool in tools:
+                with stage(stats, 'cut'):
+                    cuts2.append(booleanOp('cut', tool, shape1, fuzzy))
+                with stage(stats, 'common'):
+                    commons.append(booleanOp('common', tool, shape1, fuzzy))
+            store['cuts2'] = cuts2
+            store['commons'] = commons
+    with stage(stats, 'shapeOfMaxVol'):
+        cut1 = shapeOfMaxVol(store['cut1'], vol_tolerance)
+        others = [shapeOfMaxVol(cut2, vol_tolerance) for cut2 in store['cuts2']] + store['commons']
+    with stage(stats, 'fuse'):
+        return booleanOp('multiFuse', cut1, others, fuzzy)
+
+def splitGeneralFuse(shape1, shape2, fuzzy = 0.0):
+    '''splitGeneralFuse(shape1, shape2, fuzzy = 0.0): intersects the shapes once (General
+    Fuse) and classifies the pieces. shape2 can be a list of shapes. Returns
+    tuple (pieces1, pieces2, common), where pieces1 are the pieces of shape1
+    outside all tools, pieces2 is a list (one entry per tool) of lists of
+    pieces of the tool outside shape1, and common are the pieces shared by
+    shape1 and any tool.'''
+    tools = toolShapes(shape2)
+    gf, pieces_map = booleanOp('generalFuse', shape1, tools, fuzzy)
+    tool_pieces = {}
+    for pieces in pieces_map[1:]:
+        for sh in pieces:
+            tool_pieces.setdefault(sh.hashCode(), []).append(sh)
+    pieces1 = []
+    common = []
+    common_hashed = {}
+    for sh in pieces_map[0]:
+        if any(sh.isSame(sh2) for sh2 in tool_pieces.get(sh.hashCode(), [])):
+            common.append(sh)
+            common_hashed.setdefault(sh.hashCode(), []).append(sh)
+        else:
+            pieces1.append(sh)
+    pieces2 = [[sh for sh in pieces if not any(sh.isSame(c) for c in common_hashed.get(sh.hashCode(), []))]
+               for pieces in pieces_map[1:]]
+    return (pieces1, pieces2, common)
+
+def connectGeneralFuse(shape1, shape2, vol_tolerance = 1e-8, stats = None, fuzzy = 0.0, intermediates = None):
+    '''connectGeneralFuse(shape1, shape2, vol_tolerance = 1e-8, stats = None, fuzzy = 0.0, intermediates = None): same result as connectBoolean, but
+    the shapes are intersected only once. intermediates: see connectBoolean.
+    shape2 must be a single tool: General Fuse splits overlapping tools by
+    each other, so the pieces of a tool outside shape1 are not its cut.'''
+    if len(toolShapes(shape2)) != 1:
+        raise ValueError("connectGeneralFuse: only one tool is supported, use connectBoolean for several")
+    store = intermediates if intermediates is not None else {}
+    if not ('cut1' in store and 'cuts2' in store and 'commons' in store):
+        with stage(stats, 'generalFuse'):
+            pieces1, pieces2, common = splitGeneralFuse(shape1, shape2, fuzzy)
+        store['cut1'] = Part.makeCompound(pieces1)
+        store['cuts2'] = [Part.makeCompound(pieces) for pieces in pieces2]
+        store['commons'] = common
+    with stage(stats, 'shapeOfMaxVol'):
+        cut1 = shapeOfMaxVol(store['cut1'], vol_tolerance)
+        cuts2 = [shapeOfMaxVol(cut2, vol_tolerance) for cut2 in store['cuts2']]
+    with stage(stats, 'fuse'):
+        return booleanOp('multiFuse', cut1, cuts2 + store['commons'], fuzzy)
+
+def isGeneralFuseAvailable():
+    return hasattr(Part.Shape, "generalFuse")
+
+def joinShapes(shape1, shape2, mode, refine = False, connect_engine = 'Boolean', vol_tolerance = 1e-8, stats = None,
+               fuzzy = 0.0, processes = 1, intermediates = None):
+    '''joinShapes(shape1, shape2, mode, refine = False, connect_engine = 'Boolean', vol_tolerance = 1e-8, stats = None,
+    fuzzy = 0.0, processes = 1, intermediates = None): computes the result of
+    PartJoinFeature for given shapes. shape1 is Base, shape2 is Tool, or a
+    list of Tools. If stats (a JoinStats) is given, time of each stage is
+    recorded into it. fuzzy is the fuzzy value of booleans (0 = exact).
+    processes is the number of worker processes for independent booleans
+    (see runBooleans). GeneralFuse engine is only used with a single tool,
+    several tools are connected with Boolean engine. intermediates is a dict of cut pieces shared between
+    features on the same Base and Tool (see getIntermediates).'''
+    tools = toolShapes(shape2)
+    if len(tools) == 0:
+        raise ValueError("No tools to join with!")
+    rst = None
+    if mode == 'bypass':
+        rst = Part.makeCompound([shape1] + tools)
+    else:
+        if mode == 'Connect':
+            if connect_engine == 'GeneralFuse' and isGeneralFuseAvailable() and len(tools) == 1:
+                rst = connectGeneralFuse(shape1, tools, vol_tolerance, stats, fuzzy, intermediates)
+            else:
+                rst = connectBoolean(shape1, tools, vol_tolerance, stats, fuzzy, processes, intermediates)
+        else:
+            if intermediates is not None and 'cut1' in intermediates:
+                cut1 = intermediates['cut1']
+            else:
+                with stage(stats, 'cut'):
+                    cut1 = cutByTools(shape1, tools, fuzzy)
+                if intermediates is not None:
+                    intermediates['cut1'] = cut1
+            with stage(stats, 'shapeOfMaxVol'):
+                cut1 = shapeOfMaxVol(cut1, vol_tolerance)
+            if mode == 'Embed':
+                with stage(stats, 'fuse'):
+                    if len(tools) > 1:
+                        rst = booleanOp('multiFuse', cut1, tools, fuzzy)
+                    else:
+                        rst = booleanOp('fuse', cut1, tools[0], fuzzy)
+            elif mode == 'Cutout':
+                rst = cut1
+        if refine:
+            with stage(stats, 'refine'):
+                rst = rst.removeSplitter()
+    return rst
+
+# -------------------------- fast paths --------------------------------------------------
+def classifyPair(shape1, shape2, use_distance = False, tolerance = 1e-7, fuzzy = 0.0):
+    '''classifyPair(shape1, shape2, use_distance = False, tolerance = 1e-7, fuzzy = 0.0): cheaply
+    figures out how two shapes are related. Returns one of:
+    'DisjointBoundBox' - bounding boxes don't intersect;
+    'Disjoint' - shapes are apart (found by distance test);
+    'Shape2InsideShape1', 'Shape1InsideShape2' - one shape fully contains the other, boundaries don't touch;
+    'Overlap' - shapes may intersect, full computation is required.
+    The distance-based tests are only done if use_distance is True. Shapes
+    closer than fuzzy (the fuzzy value of booleans) are treated as touching.'''
+    tolerance = max(tolerance, fuzzy)
+    bb1 = shape1.BoundBox
+    bb2 = shape2.BoundBox
+    bb1_fuzzy = FreeCAD.BoundBox(bb1)
+    bb1_fuzzy.enlarge(fuzzy)
+    if not bb1_fuzzy.intersect(bb2):
+        return 'DisjointBoundBox'
+    if not use_distance:
+        return 'Overlap'
+    inside21 = bb1.isInside(bb2)
+    inside12 = bb2.isInside(bb1)
+    if inside21 or inside12:
+        #distance between boundaries only; distance between solids is zero if one contains the other
+        dist = Part.makeCompound(shape1.Shells).distToShape(Part.makeCompound(shape2.Shells))[0]
+    else:
+        dist = shape1.distToShape(shape2)[0]
+    if dist <= tolerance:
+        return 'Overlap'
+    if not (inside21 or inside12):
+        return 'Disjoint'
+    #boundaries don't touch, so each solid is either entirely inside the other
+    #shape or entirely outside it, and one point of it tells which
+    in21 = [isPointInside(shape1, piece.Vertexes[0].Point, tolerance) for piece in shape2.Solids or [shape2]]
+    in12 = [isPointInside(shape2, piece.Vertexes[0].Point, tolerance) for piece in shape1.Solids or [shape1]]
+    if not any(in21) and not any(in12):
+        return 'Disjoint'
+    if all(in21) and not any(in12):
+        return 'Shape2InsideShape1'
+    if all(in12) and not any(in21):
+        return 'Shape1InsideShape2'
+    return 'Overlap'
+
+def isPointInside(shape, point, tolerance):
+    '''Returns True if point is inside any solid of shape.'''
+    return any(solid.isInside(point, tolerance, True) for solid in shape.Solids)
+
+def joinTrivial(shape1, shape2, mode, relation, vol_tolerance = 1e-8):
+    '''joinTrivial(shape1, shape2, mode, relation, vol_tolerance = 1e-8): returns the result of join
+    for a pair classified by classifyPair, if it is known without booleans.
+    Returns None if full computation is required. Refine is not applied.'''
+    if relation in ('DisjointBoundBox', 'Disjoint'):
+        cut1 = shapeOfMaxVol(shape1, vol_tolerance)
+        if mode == 'Cutout':
+            return cut1
+        elif mode == 'Embed':
+            return Part.makeCompound([cut1, shape2])
+        elif mode == 'Connect':
+            return Part.makeCompound([cut1, shapeOfMaxVol(shape2, vol_tolerance)])
+    elif relation == 'Shape2InsideShape1':
+        if mode in ('Connect', 'Embed'):
+            return shape1
+        #Cutout makes a void, that needs a real cut
+    elif relation == 'Shape1InsideShape2':
+        if mode in ('Connect', 'Embed'):
+            return shape2
+        elif mode == 'Cutout':
+            raise ValueError("Base is entirely inside Tool, nothing is left after cutout!")
+    return None
+
+def joinShapesFast(shape1, shape2, mode, refine = False, use_distance = False, vol_tolerance = 1e-8, fuzzy = 0.0):
+    '''joinShapesFast(shape1, shape2, mode, refine = False, use_distance = False, vol_tolerance = 1e-8, fuzzy = 0.0):
+    tries to compute the join without booleans. Returns tuple (path, result),
+    where path is the classification of the pair (see classifyPair), and
+    result is the shape, or None if full computation is required. If shape2
+    is a list of several tools, only bypass has a fast path.'''
+    tools = toolShapes(shape2)
+    if mode == 'bypass':
+        return ('Bypass', Part.makeCompound([shape1] + tools))
+    if len(tools) != 1:
+        return ('Overlap', None)
+    shape2 = tools[0]
+    relation = classifyPair(shape1, shape2, use_distance, fuzzy = fuzzy)
+    rst = joinTrivial(shape1, shape2, mode, relation, vol_tolerance)
+    if rst is not None and refine:
+        rst = rst.removeSplitter()
+    return (relation, rst)
+
+#paths of joinShapesFast that give a result; such results can be rebuilt
+#from Base and Tool cheaply, so they needn't be stored in the file
+FAST_PATHS = ('Bypass', 'DisjointBoundBox', 'Disjoint', 'Shape2InsideShape1', 'Shape1InsideShape2')
+
+# -------------------------- /fast paths --------------------------------------------------
+
+# -------------------------- result cache --------------------------------------------------
+def shapeHash(shape):
+    '''shapeHash(shape): returns hex digest of BREP representation of the shape
+    (or of a list of shapes). Geometrically identical shapes yield equal
+    hashes, regardless of which object they come from.'''
+    if isinstance(shape, (list, tuple)):
+        return brepHash("|".join([shapeHash(sh) for sh in shape]))
+    return brepHash(shape.exportBrepToString())
+
+def brepHash(brep):
+    '''brepHash(brep): same as shapeHash, but takes BREP string.'''
+    return hashlib.sha1(brep.encode('utf-8')).hexdigest()
+
+def getVersionTag():
+    '''getVersionTag(): FreeCAD and OCC versions, as a string. Part of cache
+    keys, as results of booleans change between versions.'''
+    return "FreeCAD " + ".".join(FreeCAD.Version()[:3]) + " OCC " + getattr(Part, "OCC_VERSION", "?")
+
+class ResultCache(object):
+    '''ResultCache(size = 32, directory = ''): cache of join results, keyed on
+    geometry of the inputs. Keeps up to size shapes in memory (least recently
+    used ones are evicted). If directory is not empty, results are also stored
+    there as BREP files, and are looked up there when not found in memory.'''
+    def __init__(self, size = 32, directory = ''):
+        self.size = size
+        self.directory = directory
+        self.entries = collections.OrderedDict()
+        self.resetStats()
+
+    def resetStats(self):
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'diskHits': self.diskHits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries)}
+
+    def isEnabled(self):
+        return self.size > 0 or bool(self.directory)
+
+    def clear(self):
+        self.entries.clear()
+
+    def makeKey(self, shape1, shape2, mode, refine, vol_tolerance = 1e-8, fuzzy = 0.0):
+        return self.makeKeyFromHashes(shapeHash(shape1), shapeHash(shape2), mode, refine, vol_tolerance, fuzzy)
+
+    def makeKeyFromHashes(self, hash1, hash2, mode, refine, vol_tolerance = 1e-8, fuzzy = 0.0):
+        key = "|".join([hash1, hash2, mode, str(bool(refine)), repr(float(vol_tolerance)), getVersionTag()]
+                       + (['fuzzy=' + repr(float(fuzzy))] if fuzzy > 0 else []))
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def fileName(self, key):
+        return os.path.join(self.directory, key + ".brep")
+
+    def get(self, key):
+        '''get(key): returns cached shape, or None if not cached.'''
+        if key in self.entries:
+            sh = self.entries.pop(key)
+            self.entries[key] = sh
+            self.hits += 1
+            return sh
+        if self.directory and os.path.isfile(self.fileName(key)):
+            sh = self.readFile(key)
+            if sh is None:
+                self.misses += 1
+                return None
+            self.storeInMemory(key, sh)
+            self.hits += 1
+            self.diskHits += 1
+            return sh
+        self.misses += 1
+        return None
+
+    def readFile(self, key):
+        '''Reads a result from the disk tier. A file that can't be read (e.g.
+        left half-written by a crashed process) is deleted, and None is
+        returned.'''
+        path = self.fileName(key)
+        try:
+            sh = Part.Shape()
+            sh.importBrep(path)
+            if sh.isNull():
+                raise ValueError("empty shape")
+            return sh
+        except Exception as err:
+            FreeCAD.Console.PrintWarning("JoinFeatures: dropping unreadable cache file {path}: {err}\n".format(path = path, err = err))
+            try:
+                os.remove(path)
+            except OSError:
+                pass #another process got there first
+            return None
+
+    def put(self, key, shape):
+        self.storeInMemory(key, shape)
+        if self.directory:
+            if not os.path.isdir(self.directory):
+                try:
+                    os.makedirs(self.directory)
+                except OSError:
+                    if not os.path.isdir(self.directory): #else made by another process meanwhile
+                        raise
+            #other FreeCAD processes may share the directory: write to a temporary
+            #file and rename it, so that readers never see a partial file
+            fd, tmp = tempfile.mkstemp(suffix = ".brep.tmp", dir = self.directory)
+            os.close(fd)
+            try:
+                shape.exportBrep(tmp)
+                replace = getattr(os, 'replace', os.rename)
+                try:
+                    replace(tmp, self.fileName(key))
+                except OSError:
+                    if not os.path.isfile(self.fileName(key)): #else written by another process (Windows, Python 2)
+                        raise
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def storeInMemory(self, key, shape):
+        if self.size <= 0:
+            return
+        self.entries[key] = shape
+        while len(self.entries) > self.size:
+            self.entries.popitem(last = False)
+            self.evictions += 1
+
+_resultCache = None
+
+def getResultCache():
+    '''getResultCache(): returns the module-wide ResultCache, set up from
+    preferences (ResultCacheSize, ResultCacheDir).'''
+    global _resultCache
+    if _resultCache is None:
+        param = getParamJoin()
+        _resultCache = ResultCache(size = param.GetInt("ResultCacheSize", 32),
+                                   directory = param.GetString("ResultCacheDir", ""))
+    return _resultCache
+
+# -------------------------- /result cache --------------------------------------------------
+
+def makePartJoinFeature(name, mode = 'bypass', doc = None):
+    '''makePartJoinFeature(name, mode = 'bypass', doc = None): makes an PartJoinFeature object.
+    If doc is None, the object is added to active document.'''
+    if doc is None:
+        doc = FreeCAD.ActiveDocument
+    obj = doc.addObject("Part::FeaturePython",name)
     _PartJoinFeature(obj)
     obj.Mode = mode
     obj.Refine = getParamRefine()
-    _ViewProviderPartJoinFeature(obj.ViewObject)
+    if isGeneralFuseAvailable():
+        obj.ConnectEngine = 'GeneralFuse'
+    obj.Fuzzy = getParamFuzzy()
+    obj.Parallel = getParamParallel()
+    obj.ParallelProcesses = getParamParallelProcesses()
+    obj.CompactStorage = getParamCompactStorage()
+    obj.Async = getParamAsync()
+    if FreeCAD.GuiUp:
+        _ViewProviderPartJoinFeature(obj.ViewObject)
     return obj
 
+# -------------------------- shared intermediates --------------------------------------------------
+_intermediateStores = {} #document name -> {(base name, tool names): (revision, dict of pieces)}
+_intermediatesObserver = None
+
+class _IntermediatesObserver(object):
+    "Drops shared intermediates when their inputs change, or the document is closed."
+    def slotChangedObject(self, obj, prop):
+        if prop in ('Shape', 'Placement'):
+            invalidateIntermediates(obj)
+
+    def slotDeletedObject(self, obj):
+        invalidateIntermediates(obj)
+
+    def slotDeletedDocument(self, doc):
+        _intermediateStores.pop(doc.Name, None)
+
+def getIntermediates(base, tools, fuzzy = 0.0):
+    '''getIntermediates(base, tools, fuzzy = 0.0): returns the dict of cut pieces
+    ('cut1': Base cut by tools; 'cuts2': list of each tool cut by Base;
+    'commons': list of common pieces) shared by all join features of this
+    Base and tools (document objects). The dict is emptied if the shapes
+    changed since the pieces were stored.'''
+    global _intermediatesObserver
+    if _intermediatesObserver is None and hasattr(FreeCAD, 'addDocumentObserver'):
+        _intermediatesObserver = _IntermediatesObserver()
+        FreeCAD.addDocumentObserver(_intermediatesObserver)
+    pair = (base.Name, tuple(tool.Name for tool in tools))
+    #hashCode changes whenever a shape is recomputed or moved
+    revision = (base.Shape.hashCode(), tuple(tool.Shape.hashCode() for tool in tools), fuzzy)
+    store = _intermediateStores.setdefault(base.Document.Name, {})
+    entry = store.get(pair)
+    if entry is None or entry[0] != revision:
+        entry = (revision, {})
+        store[pair] = entry
+    return entry[1]
+
+def invalidateIntermediates(obj):
+    '''invalidateIntermediates(obj): drops shared intermediates that obj is an input of.'''
+    store = _intermediateStores.get(obj.Document.Name)
+    if not store:
+        return
+    for pair in list(store.keys()):
+        if obj.Name == pair[0] or obj.Name in pair[1]:
+            del store[pair]
+
+def clearIntermediates():
+    _intermediateStores.clear()
+
+# -------------------------- /shared intermediates --------------------------------------------------
+
+# -------------------------- worker processes --------------------------------------------------
+def brepsHash(brep):
+    '''brepsHash(brep): brepHash of a BREP string, or of a list of them, consistent with shapeHash.'''
+    if isinstance(brep, (list, tuple)):
+        return brepHash("|".join([brepsHash(b) for b in brep]))
+    return brepHash(brep)
+
+def shapeToBrep(shape):
+    if isinstance(shape, (list, tuple)):
+        return [shapeToBrep(sh) for sh in shape]
+    return shape.exportBrepToString()
+
+def shapeFromBrep(brep):
+    if isinstance(brep, (list, tuple)):
+        return [shapeFromBrep(b) for b in brep]
+    shape = Part.Shape()
+    shape.importBrepFromString(brep)
+    return shape
+
+def makeJoinTask(shape1, shape2, mode, refine = False, connect_engine = 'Boolean', vol_tolerance = 1e-8,
+                 use_distance = False, fuzzy = 0.0):
+    '''makeJoinTask(shape1, shape2, mode, ...): packs arguments of joinShapes
+    into a picklable dict, with shapes as BREP strings, for _joinWorker.'''
+    return {'base': shapeToBrep(shape1),
+            'tool': shapeToBrep(shape2),
+            'mode': mode,
+            'refine': refine,
+            'connect_engine': connect_engine,
+            'vol_tolerance': vol_tolerance,
+            'use_distance': use_distance,
+            'fuzzy': fuzzy}
+
+def taskCacheKey(cache, task):
+    return cache.makeKeyFromHashes(brepsHash(task['base']), brepsHash(task['tool']), task['mode'],
+                                   task['refine'], task['vol_tolerance'], task['fuzzy'])
+
+def _joinWorker(task, progress = None):
+    '''Runs in a worker process. task is made by makeJoinTask. progress is an
+    optional callable, called with the name of each stage as it begins.
+    Returns tuple (brep of result, error message, compute path, stats); stats
+    is JoinStats.asDict() with 'total' time added. If computation failed, all
+    but error message are None.'''
+    try:
+        t = time.time()
+        stats = JoinStats()
+        stats.onStage = progress
+        shape1 = shapeFromBrep(task['base'])
+        shape2 = shapeFromBrep(task['tool'])
+        with stage(stats, 'precheck'):
+            path, rst = joinShapesFast(shape1, shape2, task['mode'], task['refine'], task['use_distance'],
+                                       task['vol_tolerance'], task['fuzzy'])
+        if rst is None:
+            #workers are daemonic processes, they can't have workers of their own
+            rst = joinShapes(shape1, shape2, task['mode'], task['refine'], task['connect_engine'],
+                             task['vol_tolerance'], stats, task['fuzzy'], processes = 1)
+            path = 'Full'
+        record = stats.asDict()
+        record['total'] = time.time() - t
+        return (rst.exportBrepToString(), None, path, record)
+    except Exception as err:
+        return (None, str(err), None, None)
+
+def _asyncWorker(task, result_queue):
+    result_queue.put(('done', _joinWorker(task, progress = lambda name: result_queue.put(('stage', name)))))
+
+class AsyncJoin(object):
+    '''AsyncJoin(task, key = None): computes a join (task is made by
+    makeJoinTask) in a separate process. Call poll() periodically from the
+    main thread; it returns True when finished. Then, result is the shape, or
+    error is the error message; path and record are the compute path and
+    stats of the worker (see _joinWorker). stage is the name of the stage the worker
+    is in (cut, common, fuse, refine, ...). key is for the caller to tell
+    which inputs the job is for. Needs a platform that can fork (see
+    isAsyncAvailable).'''
+    def __init__(self, task, key = None):
+        context = getWorkerContext()
+        if context is None:
+            raise RuntimeError("AsyncJoin: worker processes can't be forked on this platform")
+        self.key = key
+        self.stage = 'starting'
+        self.result = None
+        self.error = None
+        self.path = None
+        self.record = None
+        self.done = False
+        self.queue = context.Queue()
+        self.process = context.Process(target = _asyncWorker, args = (task, self.queue))
+        self.process.daemon = True
+        self.process.start()
+
+    def poll(self):
+        '''poll(): reads progress reports of the worker. Returns True if the job has finished.'''
+        while not self.done:
+            try:
+                kind, value = self.queue.get_nowait()
+            except queue.Empty:
+                if not self.process.is_alive() and self.queue.empty():
+                    self.error = "Worker process died"
+                    self.done = True
+                break
+            if kind == 'stage':
+                self.stage = value
+            else:
+                brep, self.error, self.path, self.record = value
+                if brep is not None:
+                    self.result = shapeFromBrep(brep)
+                self.done = True
+                self.process.join()
+        return self.done
+
+    def cancel(self):
+        if not self.done:
+            self.process.terminate()
+            self.process.join()
+            self.error = "Cancelled"
+            self.done = True
+
+# -------------------------- /worker processes --------------------------------------------------
+
+# -------------------------- batch API --------------------------------------------------
+def makePartJoinFeatures(triples, processes = None, doc = None):
+    '''makePartJoinFeatures(triples, processes = None, doc = None): makes many
+    PartJoinFeature objects at once. triples is a list of (base, tool, mode),
+    where base and tool are document objects. Booleans are computed in a pool
+    of processes worker processes (None = number of CPUs; 0 or 1 = compute in
+    this process, which is also done if the platform can't fork), shapes are passed to and from workers as BREP strings.
+    Features are then created in a single transaction, with precomputed shapes.
+    Features that failed to compute are left touched, so that recompute
+    reports the error. Does not need FreeCADGui. Returns list of features.'''
+    if doc is None:
+        doc = FreeCAD.ActiveDocument
+    refine = getParamRefine()
+    connect_engine = 'GeneralFuse' if isGeneralFuseAvailable() else 'Boolean'
+    #same settings as makePartJoinFeature gives to new features
+    tasks = [makeJoinTask(base.Shape, tool.Shape, mode, refine, connect_engine, fuzzy = getParamFuzzy())
+             for (base, tool, mode) in triples]
+    context = getWorkerContext()
+    if (processes is not None and processes <= 1) or context is None:
+        results = [_joinWorker(task) for task in tasks]
+    else:
+        pool = context.Pool(processes)
+        try:
+            results = pool.map(_joinWorker, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    cache = getResultCache()
+    features = []
+    doc.openTransaction("Create join features")
+    try:
+        for (base, tool, mode), task, (brep, err, path, record) in zip(triples, tasks, results):
+            obj = makePartJoinFeature(name = mode, mode = mode, doc = doc)
+            obj.Base = base
+            obj.Tool = tool
+            if brep is None:
+                FreeCAD.Console.PrintError("JoinFeatures: {name} failed: {err}\n".format(name = obj.Name, err = err))
+            else:
+                rst = shapeFromBrep(brep)
+                obj.Proxy.setResult(obj, path, rst)
+                obj.Proxy.recordStats(obj, record)
+                obj.purgeTouched()
+                if mode != 'bypass' and cache.isEnabled():
+                    #seed the cache, so that recompute of the document doesn't redo the booleans
+                    cache.put(taskCacheKey(cache, task), rst)
+            features.append(obj)
+    finally:
+        doc.commitTransaction()
+    return features
+
+# -------------------------- /batch API --------------------------------------------------
+
 class _PartJoinFeature:
     "The PartJoinFeature object"
     def __init__(self,obj):
@@ -90,29 +893,194 @@ class _PartJoinFeature:
         obj.addProperty("App::PropertyLink","Base","Join","First object")
         obj.addProperty("App::PropertyLink","Tool","Join","Second object")
         obj.addProperty("App::PropertyBool","Refine","Join","True = refine resulting shape. False = output as is.")
+        self.assureProperties(obj)
         
         obj.Proxy = self
         
+    def assureProperties(self, obj):
+        '''Adds properties that are missing in documents made by older versions.'''
+        if not hasattr(obj, "Tools"):
+            obj.addProperty("App::PropertyLinkList","Tools","Join","More objects to join with Base, in addition to Tool. All tools are processed by one boolean operation.")
+        if not hasattr(obj, "ConnectEngine"):
+            obj.addProperty("App::PropertyEnumeration","ConnectEngine","Join","Algorithm used in Connect mode. Boolean = cut, cut, common, fuse (legacy). GeneralFuse = intersect once and classify pieces (faster; with several tools, Boolean is used).")
+            obj.ConnectEngine = ['Boolean','GeneralFuse']
+            obj.ConnectEngine = 'Boolean'
+        if not hasattr(obj, "DistanceCheck"):
+            obj.addProperty("App::PropertyBool","DistanceCheck","Join","If True, a distance test is done before computing, to detect shapes that are apart or fully inside one another. Helps if they are often apart, but bounding boxes overlap.")
+        if not hasattr(obj, "ComputePath"):
+            obj.addProperty("App::PropertyString","ComputePath","Join","How the result was obtained on last recompute: Bypass, Cache, Full (booleans were computed), Async (computed in background), or a fast path (DisjointBoundBox, Disjoint, Shape2InsideShape1, Shape1InsideShape2)")
+            obj.setEditorMode("ComputePath", 1) #read-only
+        if not hasattr(obj, "VolumeTolerance"):
+            obj.addProperty("App::PropertyFloat","VolumeTolerance","Join","Pieces whose volumes differ by less than this are considered equal, when picking the largest piece after a cut.")
+            obj.VolumeTolerance = 1e-8
+        if hasattr(obj, "IncrementalRefine"):
+            #made by versions that had it; its result wasn't the same as full refine
+            obj.removeProperty("IncrementalRefine")
+        if not hasattr(obj, "RecomputeStats"):
+            obj.addProperty("App::PropertyString","RecomputeStats","Join","Statistics of last recompute (JSON): wall time per stage in seconds, face/edge/solid counts of inputs and result, peak resident memory per stage and of parallel boolean workers in KB (null where it can't be measured)")
+            obj.setEditorMode("RecomputeStats", 1) #read-only
+        if not hasattr(obj, "Fuzzy"):
+            obj.addProperty("App::PropertyFloat","Fuzzy","Join","Fuzzy value of boolean operations: faces closer than this are treated as coincident. 0 = exact. Helps with near-coincident faces.")
+        if not hasattr(obj, "Parallel"):
+            obj.addProperty("App::PropertyBool","Parallel","Join","If True, independent boolean operations (the cuts and commons of Connect with Boolean engine, which is also used with several tools) are computed concurrently in worker processes. Has no effect on other modes and on GeneralFuse engine.")
+            obj.addProperty("App::PropertyInteger","ParallelProcesses","Join","Number of worker processes used if Parallel is True. 0 = number of CPUs.")
+        if not hasattr(obj, "CompactStorage"):
+            obj.addProperty("App::PropertyBool","CompactStorage","Join","If True, results made without booleans (bypass, and fast paths returning unchanged inputs) are not saved into the file, but rebuilt from Base and Tool on load. Needs FreeCAD with setPropertyStatus.")
+        if not hasattr(obj, "Async"):
+            obj.addProperty("App::PropertyBool","Async","Join","If True (and GUI is up, and the platform can fork processes), booleans are computed in a separate process, so GUI stays responsive. The old shape is shown until the result is ready. Computation can be cancelled from context menu.")
 
-    def execute(self,obj):
-        rst = None
-        if obj.Mode == 'bypass':
-            rst = Part.makeCompound([obj.Base.Shape, obj.Tool.Shape])
-        else:
-            cut1 = obj.Base.Shape.cut(obj.Tool.Shape)
-            cut1 = shapeOfMaxVol(cut1)
-            if obj.Mode == 'Connect':
-                cut2 = obj.Tool.Shape.cut(obj.Base.Shape)
-                cut2 = shapeOfMaxVol(cut2)
-                rst = cut1.multiFuse([cut2, obj.Tool.Shape.common(obj.Base.Shape)])
-            elif obj.Mode == 'Embed':
-                rst = cut1.fuse(obj.Tool.Shape)
-            elif obj.Mode == 'Cutout':
-                rst = cut1
-            if obj.Refine:
-                rst = rst.removeSplitter()
+    def onDocumentRestored(self, obj):
+        self.assureProperties(obj)
+        self.rebuildShape(obj)
+
+    def isCompact(self, obj):
+        return obj.CompactStorage and obj.ComputePath in FAST_PATHS and hasattr(obj, "setPropertyStatus")
+
+    def rebuildShape(self, obj):
+        '''If the shape wasn't saved (see CompactStorage), rebuilds it from Base
+        and tools, without booleans. Inputs that weren't saved either are
+        rebuilt first.'''
+        if not self.isCompact(obj) or not obj.Shape.isNull():
+            return
+        for dep in [obj.Base] + self.getToolObjects(obj):
+            proxy = getattr(dep, 'Proxy', None)
+            if getattr(proxy, 'Type', None) == self.Type:
+                proxy.rebuildShape(dep)
+        path, rst = joinShapesFast(obj.Base.Shape, self.getToolShapes(obj), obj.Mode, obj.Refine, obj.DistanceCheck, obj.VolumeTolerance, obj.Fuzzy)
+        if rst is None:
+            obj.touch() #inputs aren't what they were; a real recompute is needed
+            return
         obj.Shape = rst
+        obj.setPropertyStatus("Shape", "Transient") #status isn't saved with the file
+        obj.purgeTouched()
+
+    def __getstate__(self):
+        return {'Type': self.Type} #not the running job
+
+    def __setstate__(self, state):
+        self.Type = state['Type']
+
+    def getToolObjects(self, obj):
+        return ([obj.Tool] if obj.Tool else []) + obj.Tools
+
+    def getToolShapes(self, obj):
+        '''Returns shape of Tool if it is the only tool, or list of shapes of Tool and Tools.'''
+        tools = self.getToolObjects(obj)
+        if len(tools) == 1:
+            return tools[0].Shape
+        return [tool.Shape for tool in tools]
+
+    def execute(self,obj):
+        stats = JoinStats()
+        t = time.time()
+        tools = self.getToolShapes(obj)
+        with stage(stats, 'precheck'):
+            path, rst = joinShapesFast(obj.Base.Shape, tools, obj.Mode, obj.Refine, obj.DistanceCheck, obj.VolumeTolerance, obj.Fuzzy)
+        if rst is None:
+            cache = getResultCache()
+            key = None
+            task = None
+            if obj.Async and FreeCAD.GuiUp and isAsyncAvailable():
+                #the worker needs the inputs as BREP anyway; the cache key is made from the same export
+                task = makeJoinTask(obj.Base.Shape, tools, obj.Mode, obj.Refine, obj.ConnectEngine,
+                                    obj.VolumeTolerance, obj.DistanceCheck, obj.Fuzzy)
+                key = taskCacheKey(cache, task)
+            if cache.isEnabled():
+                with stage(stats, 'cacheLookup'):
+                    if key is None:
+                        key = cache.makeKey(obj.Base.Shape, tools, obj.Mode, obj.Refine, obj.VolumeTolerance, obj.Fuzzy)
+                    rst = cache.get(key)
+                if rst is not None:
+                    path = 'Cache'
+            if rst is None and task is not None:
+                rst = self.executeAsync(obj, task, key, stats)
+                if rst is None:
+                    return #pending; the old shape stays until the result arrives
+                path = 'Async'
+            elif rst is None:
+                rst = joinShapes(obj.Base.Shape, tools, obj.Mode, obj.Refine, obj.ConnectEngine, obj.VolumeTolerance, stats,
+                                 obj.Fuzzy, obj.ParallelProcesses if obj.Parallel else 1, self.getSharedIntermediates(obj))
+                path = 'Full'
+                if key is not None:
+                    cache.put(key, rst)
+        self.setResult(obj, path, rst)
+        record = stats.asDict()
+        record['total'] = time.time() - t
+        self.recordStats(obj, record)
         return
+
+    def setResult(self, obj, path, rst):
+        obj.ComputePath = path
+        obj.Shape = rst
+        if hasattr(obj, "setPropertyStatus"):
+            obj.setPropertyStatus("Shape", "Transient" if self.isCompact(obj) else "-Transient")
+
+    def getSharedIntermediates(self, obj):
+        '''Returns the intermediates dict shared with sibling join features (same
+        Base and tools), or None if there are no siblings (then storing the
+        pieces would only waste memory).'''
+        tools = self.getToolObjects(obj)
+        tool_names = [tool.Name for tool in tools]
+        for other in obj.Base.InList:
+            if (other.Name != obj.Name
+                    and getattr(getattr(other, 'Proxy', None), 'Type', None) == self.Type
+                    and other.Base is not None and other.Base.Name == obj.Base.Name
+                    and [tool.Name for tool in other.Proxy.getToolObjects(other)] == tool_names
+                    and getattr(other, 'Fuzzy', 0.0) == obj.Fuzzy):
+                return getIntermediates(obj.Base, tools, obj.Fuzzy)
+        return None
+
+    def executeAsync(self, obj, task, key, stats):
+        '''Returns the result, if the background job for current inputs (task,
+        made by makeJoinTask, and its cache key) has finished; stats of the
+        worker are then merged into stats. Otherwise, starts the job (unless it
+        is already running), and returns None.'''
+        cache = getResultCache()
+        job = getattr(self, 'asyncJob', None)
+        if job is not None and job.key == key:
+            if not job.poll():
+                return None
+            self.asyncJob = None
+            if job.error is not None:
+                raise ValueError(job.error)
+            stats.merge(job.record)
+            if cache.isEnabled():
+                cache.put(key, job.result)
+            return job.result
+        if job is not None:
+            job.cancel() #inputs have changed
+        self.asyncJob = AsyncJoin(task, key)
+        watchAsyncJoin(obj, self.asyncJob)
+        return None
+
+    def cancelAsync(self, obj):
+        '''Aborts the background computation. The old shape is kept, and the
+        feature is left touched.'''
+        job = getattr(self, 'asyncJob', None)
+        if job is not None:
+            job.cancel()
+            self.asyncJob = None
+            obj.touch()
+
+    def isPending(self):
+        job = getattr(self, 'asyncJob', None)
+        return job is not None and not job.done
+
+    def recordStats(self, obj, record):
+        '''Writes RecomputeStats. record is JoinStats.asDict() of the computation,
+        with 'total' time added.'''
+        shapes = record['shapes']
+        shapes['Base'] = shapeComplexity(obj.Base.Shape)
+        for i, tool in enumerate(toolShapes(self.getToolShapes(obj))):
+            shapes['Tool' if i == 0 else 'Tool{i}'.format(i = i)] = shapeComplexity(tool)
+        shapes['Result'] = shapeComplexity(obj.Shape)
+        record['path'] = obj.ComputePath
+        obj.RecomputeStats = json.dumps(record)
+        if getParamJoin().GetBool("LogRecomputeStats", False):
+            record['object'] = obj.Name
+            record['document'] = obj.Document.Name
+            record['mode'] = obj.Mode
+            FreeCAD.Console.PrintMessage("JoinFeatures stats: " + json.dumps(record) + "\n")
         
         
 class _ViewProviderPartJoinFeature:
@@ -122,6 +1090,8 @@ class _ViewProviderPartJoinFeature:
         vobj.Proxy = self
        
     def getIcon(self):
+        if getattr(self, 'pending', False):
+            return ":/icons/view-refresh.svg" #FreeCAD's own icon
         if self.Object == None:
             return getIconPath("Part-joinConnect.svg")
         else:
@@ -136,6 +1106,19 @@ class _ViewProviderPartJoinFeature:
         self.ViewObject = vobj
         self.Object = vobj.Object
 
+    def setPending(self, pending):
+        '''Shows that the shape is outdated and a new one is being computed, by
+        the icon in the tree. View properties are left alone, so that nothing
+        of it gets saved or recorded for undo.'''
+        self.pending = pending
+        if hasattr(self.ViewObject, "signalChangeIcon"):
+            self.ViewObject.signalChangeIcon()
+
+    def setupContextMenu(self, vobj, menu):
+        if self.Object.Proxy.isPending():
+            action = menu.addAction("Cancel computation")
+            action.triggered.connect(lambda: self.Object.Proxy.cancelAsync(self.Object))
+
   
     def setEdit(self,vobj,mode):
         return False
@@ -149,113 +1132,48 @@ class _ViewProviderPartJoinFeature:
     def __setstate__(self,state):
         return None
 
-def CreateJoinFeature(name, mode):
-    FreeCAD.ActiveDocument.openTransaction("Create "+mode+"ObjectsFeature")
-    FreeCADGui.addModule("JoinFeatures")
-    FreeCADGui.doCommand("j = JoinFeatures.makePartJoinFeature(name = '"+name+"', mode = '"+mode+"' )")
-    FreeCADGui.doCommand("j.Base = FreeCADGui.Selection.getSelection()[0]")
-    FreeCADGui.doCommand("j.Tool = FreeCADGui.Selection.getSelection()[1]")
-    FreeCADGui.doCommand("j.Proxy.execute(j)")
-    FreeCADGui.doCommand("j.purgeTouched()")
-    FreeCADGui.doCommand("j.Base.ViewObject.hide()")
-    FreeCADGui.doCommand("j.Tool.ViewObject.hide()")
-    FreeCAD.ActiveDocument.commitTransaction()
+def watchAsyncJoin(obj, job, interval = 200):
+    '''watchAsyncJoin(obj, job, interval = 200): polls an AsyncJoin of obj from
+    Qt event loop, shows its progress in status bar and pending state in the
+    view provider. When the job finishes, the document is recomputed, which
+    picks up the result.'''
+    import FreeCADGui
+    from PySide import QtCore
+    label = obj.Label
+    obj.ViewObject.Proxy.setPending(True)
+    def check():
+        watching = False
+        try:
+            finished = job.poll()
+            statusbar = FreeCADGui.getMainWindow().statusBar()
+            if not finished:
+                statusbar.showMessage("{label}: computing ({stage})...".format(label = label, stage = job.stage))
+                QtCore.QTimer.singleShot(interval, check)
+                watching = True
+                return
+            statusbar.showMessage("{label}: {state}".format(label = label, state = job.error or "done"), 3000)
+            current = getattr(obj.Proxy, 'asyncJob', None)
+            if current is not None and current is not job:
+                watching = True #superseded by a newer job, whose watcher takes over pending state
+                return
+            if current is None:
+                return #cancelled
+            obj.touch()
+            obj.Document.recompute()
+        except Exception as err:
+            #e.g. object was deleted
+            job.cancel()
+            FreeCAD.Console.PrintLog("JoinFeatures: stopped watching {label}: {err}\n".format(label = label, err = err))
+        finally:
+            if not watching:
+                try:
+                    obj.ViewObject.Proxy.setPending(False)
+                except Exception:
+                    pass #object is gone
+    QtCore.QTimer.singleShot(interval, check)
 
 def getIconPath(icon_dot_svg):
+    import JoinFeatures_rc #registers the icons with Qt on first use; not needed for recompute
     return ":/icons/" + icon_dot_svg
 
 # -------------------------- /common stuff --------------------------------------------------
-
-# -------------------------- ConnectObjectsFeature --------------------------------------------------
-
-class _CommandConnectFeature:
-    "Command to create PartJoinFeature in Connect mode"
-    def GetResources(self):
-        return {'Pixmap'  : getIconPath("Part-joinConnect.svg"),
-                'MenuText': QtCore.QT_TRANSLATE_NOOP("Part_ConnectFeature","Connect objects..."),
-                'Accel': "",
-                'ToolTip': QtCore.QT_TRANSLATE_NOOP("Part_ConnectFeature","Fuses objects, taking care to preserve voids.")}
-        
-    def Activated(self):
-        if len(FreeCADGui.Selection.getSelection()) == 2 :
-            CreateJoinFeature(name = "Connect", mode = "Connect")
-        else:
-            mb = QtGui.QMessageBox()
-            mb.setIcon(mb.Icon.Warning)
-            mb.setText(_translate("Part_JoinFeatures", "Two solids need to be selected, first!", None))
-            mb.setWindowTitle(_translate("Part_JoinFeatures","Bad selection", None))
-            mb.exec_()
-            
-    def IsActive(self):
-        if FreeCAD.ActiveDocument:
-            return True
-        else:
-            return False
-            
-FreeCADGui.addCommand('Part_ConnectFeature',_CommandConnectFeature())
-
-# -------------------------- /PartJoinFeature --------------------------------------------------
-
-
-# -------------------------- EmbedFeature --------------------------------------------------
-
-class _CommandEmbedFeature:
-    "Command to create PartJoinFeature in Embed mode"
-    def GetResources(self):
-        return {'Pixmap'  : getIconPath("Part-joinEmbed.svg"),
-                'MenuText': QtCore.QT_TRANSLATE_NOOP("Part_EmbedFeature","Embed object"),
-                'Accel': "",
-                'ToolTip': QtCore.QT_TRANSLATE_NOOP("Part_EmbedFeature","Fuses one object into another, taking care to preserve voids.")}
-        
-    def Activated(self):
-        if len(FreeCADGui.Selection.getSelection()) == 2 :
-            CreateJoinFeature(name = "Embed", mode = "Embed")
-        else:
-            mb = QtGui.QMessageBox()
-            mb.setIcon(mb.Icon.Warning)
-            mb.setText(_translate("Part_JoinFeatures","Select base object, then the object to embed, and invoke this tool.", None))
-            mb.setWindowTitle(_translate("Part_JoinFeatures","Bad selection", None))
-            mb.exec_()
-
-        
-    def IsActive(self):
-        if FreeCAD.ActiveDocument:
-            return True
-        else:
-            return False
-
-FreeCADGui.addCommand('Part_EmbedFeature',_CommandEmbedFeature())
-
-# -------------------------- /EmbedFeature --------------------------------------------------
-
-
-
-# -------------------------- CutoutFeature --------------------------------------------------
-
-class _CommandCutoutFeature:
-    "Command to create PartJoinFeature in Cutout mode"
-    def GetResources(self):
-        return {'Pixmap'  : getIconPath("Part-joinCutout.svg"),
-                'MenuText': QtCore.QT_TRANSLATE_NOOP("Part_CutoutFeature","Cutout for object"),
-                'Accel': "",
-                'ToolTip': QtCore.QT_TRANSLATE_NOOP("Part_CutoutFeature","Makes a cutout in one object to fit another object.")}
-        
-    def Activated(self):
-        if len(FreeCADGui.Selection.getSelection()) == 2 :
-            CreateJoinFeature(name = "Cutout", mode = "Cutout")
-        else:
-            mb = QtGui.QMessageBox()
-            mb.setIcon(mb.Icon.Warning)
-            mb.setText(_translate("Part_JoinFeatures","Select the object to make a cutout in, then the object that should fit into the cutout, and invoke this tool.", None))
-            mb.setWindowTitle(_translate("Part_JoinFeatures","Bad selection", None))
-            mb.exec_()
-
-    def IsActive(self):
-        if FreeCAD.ActiveDocument:
-            return True
-        else:
-            return False
-
-FreeCADGui.addCommand('Part_CutoutFeature',_CommandCutoutFeature())
-
-# -------------------------- /CutoutFeature --------------------------------------------------
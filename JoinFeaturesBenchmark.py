@@ -0,0 +1,282 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2015 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+'''Benchmark of JoinFeatures recompute time. Runs headless, e.g.:
+    FreeCADCmd JoinFeaturesBenchmark.py --output results.json --baseline baseline.json
+or from FreeCAD's Python console:
+    import JoinFeaturesBenchmark
+    JoinFeaturesBenchmark.run(output = 'results.json', baseline = 'baseline.json')
+'''
+
+import FreeCAD, Part
+from FreeCAD import Vector
+import JoinFeatures
+import os, sys, time, json, math, argparse, tempfile, shutil
+
+__title__="JoinFeatures benchmark"
+__author__ = "DeepSOIC"
+__url__ = "http://www.freecadweb.org"
+
+MODES = ['bypass','Connect','Embed','Cutout']
+
+# -------------------------- generated shapes --------------------------------------------------
+def makePrism(n, r, h, pnt = Vector(), dir = Vector(0,0,1)):
+    '''makePrism(n, r, h, pnt, dir): regular n-gonal prism, circumradius r, height h, axis along dir.'''
+    rot = FreeCAD.Rotation(Vector(0,0,1), dir)
+    pts = [rot.multVec(Vector(r*math.cos(2*math.pi*i/n), r*math.sin(2*math.pi*i/n), 0)) + pnt
+           for i in range(n)]
+    face = Part.Face(Part.makePolygon(pts + [pts[0]]))
+    return face.extrude(Vector(dir).normalize()*h)
+
+def makePipe(n, pnt, dir):
+    return makePrism(n, 10.0, 100.0, pnt, dir).cut(makePrism(n, 8.0, 100.0, pnt, dir))
+
+def casePipes(size):
+    '''T junction of n-gonal pipes: tool starts at the axis of base. Connect must
+    preserve the void inside them. (Pipes crossing at midpoints would cut each
+    other into halves of equal volume, which no mode can pick from.)'''
+    n = 8*size
+    base = makePipe(n, Vector(0,0,-50), Vector(0,0,1))
+    tool = makePipe(n, Vector(0,0,0), Vector(1,0,0))
+    return (base, tool)
+
+def makePlate(size):
+    plate = Part.makeBox(100, 100, 5)
+    step = 100.0/size
+    holes = [Part.makeCylinder(step/4, 5, Vector(step*(i+0.5), step*(j+0.5), 0))
+             for i in range(size) for j in range(size)]
+    return plate.cut(Part.makeCompound(holes))
+
+def casePlate(size):
+    '''Plate with size x size holes, and a box going through it.'''
+    return (makePlate(size), Part.makeBox(30, 30, 20, Vector(35,35,-5)))
+
+def caseSlivers(size):
+    '''Base is cut by a comb of 4*size fins into one large piece and many slivers.'''
+    base = Part.makeBox(100, 10, 10)
+    n = 4*size
+    fins = [Part.makeBox(0.1, 14, 14, Vector(50 + 50.0*(i+0.5)/n, -2, -2)) for i in range(n)]
+    spine = Part.makeBox(50, 2, 14, Vector(50, 10, -2))
+    tool = spine.multiFuse(fins)
+    return (base, tool)
+
+def caseDisjoint(size):
+    '''Plate with holes and a box far away from it.'''
+    return (makePlate(size), Part.makeBox(10, 10, 10, Vector(200,200,200)))
+
+CASES = [('pipes', casePipes),
+         ('plate', casePlate),
+         ('slivers', caseSlivers),
+         ('disjoint', caseDisjoint)]
+
+# -------------------------- /generated shapes --------------------------------------------------
+
+def timeJoin(doc, base, tool, mode, refine, repeat, connect_engine = 'Boolean'):
+    '''Returns dict with best time of execute() over repeat runs, and the path taken.
+    All settings that affect the time are set explicitly, so that results
+    don't depend on preferences of the user or defaults of the FreeCAD they
+    were made with.'''
+    obj = JoinFeatures.makePartJoinFeature(name = 'Bench', mode = mode, doc = doc)
+    obj.Base = base
+    obj.Tool = tool
+    obj.Refine = refine
+    obj.ConnectEngine = connect_engine
+    obj.Async = False
+    obj.Fuzzy = 0.0
+    obj.Parallel = False
+    obj.DistanceCheck = False
+    obj.VolumeTolerance = 1e-8
+    obj.CompactStorage = False
+    record = {}
+    try:
+        best = None
+        for i in range(repeat):
+            t = time.time()
+            obj.Proxy.execute(obj)
+            dt = time.time() - t
+            best = dt if best is None else min(best, dt)
+        record['time'] = best
+        record['path'] = obj.ComputePath
+    except Exception as err:
+        record['error'] = str(err)
+    doc.removeObject(obj.Name)
+    return record
+
+def runCases(sizes = (1, 2, 4, 8), repeat = 3, cases = None):
+    '''runCases(sizes = (1, 2, 4, 8), repeat = 3, cases = None): times execute() for
+    all cases (names from CASES; None = all), sizes, modes, and Refine on and off.
+    Connect is timed with each available engine. Returns list of result records.'''
+    engines = ['Boolean', 'GeneralFuse'] if JoinFeatures.isGeneralFuseAvailable() else ['Boolean']
+    #the result cache would make all runs after the first one instant
+    saved_cache = JoinFeatures._resultCache
+    JoinFeatures._resultCache = JoinFeatures.ResultCache(size = 0)
+    doc = FreeCAD.newDocument("JoinFeaturesBenchmark")
+    results = []
+    try:
+        for case_name, case_func in CASES:
+            if cases is not None and case_name not in cases:
+                continue
+            for size in sizes:
+                base_shape, tool_shape = case_func(size)
+                base = doc.addObject("Part::Feature", "Base")
+                base.Shape = base_shape
+                tool = doc.addObject("Part::Feature", "Tool")
+                tool.Shape = tool_shape
+                for mode in MODES:
+                    for engine in (engines if mode == 'Connect' else ['Boolean']):
+                        for refine in (False, True):
+                            record = {'case': case_name, 'size': size, 'mode': mode, 'refine': refine,
+                                      'connectEngine': engine,
+                                      'baseFaces': len(base_shape.Faces), 'toolFaces': len(tool_shape.Faces)}
+                            record.update(timeJoin(doc, base, tool, mode, refine, repeat, engine))
+                            FreeCAD.Console.PrintMessage("{case} size={size} {mode} {connectEngine} refine={refine}: {res}\n"
+                                .format(res = record.get('time', record.get('error')), **record))
+                            results.append(record)
+                doc.removeObject(base.Name)
+                doc.removeObject(tool.Name)
+    finally:
+        FreeCAD.closeDocument(doc.Name)
+        JoinFeatures._resultCache = saved_cache
+    return results
+
+def recordKey(record):
+    return (record['case'], record['size'], record['mode'], record['refine'],
+            record.get('connectEngine', 'Boolean'))
+
+def compare(results, baseline_results, threshold = 1.25, min_time = 0.01):
+    '''compare(results, baseline_results, threshold = 1.25, min_time = 0.01): returns
+    list of (record, baseline record) that regressed: got slower by more than
+    threshold times and by more than min_time seconds, or failed. Failures
+    are reported even if baseline has no (or no successful) record for the
+    case; baseline record is None then.'''
+    baseline_by_key = dict((recordKey(r), r) for r in baseline_results)
+    regressions = []
+    for record in results:
+        old = baseline_by_key.get(recordKey(record))
+        if 'time' not in record:
+            regressions.append((record, old))
+        elif old is None or 'time' not in old:
+            continue
+        elif record['time'] > old['time']*threshold and record['time'] - old['time'] > min_time:
+            regressions.append((record, old))
+    return regressions
+
+def run(output = 'JoinFeaturesBenchmark.json', baseline = None, update_baseline = False,
+        sizes = (1, 2, 4, 8), repeat = 3, threshold = 1.25, cases = None):
+    '''run(output = 'JoinFeaturesBenchmark.json', baseline = None, update_baseline = False,
+    sizes = (1, 2, 4, 8), repeat = 3, threshold = 1.25, cases = None): runs the
+    benchmark, writes results to output (JSON) and compares them to baseline
+    file, if given. If update_baseline is True, results are also written to
+    baseline. Returns list of regressions (see compare); cases that failed
+    are always there.'''
+    results = runCases(sizes, repeat, cases)
+    data = {'freecadVersion': FreeCAD.Version()[:3],
+            'generalFuse': JoinFeatures.isGeneralFuseAvailable(),
+            'results': results}
+    with open(output, 'w') as f:
+        json.dump(data, f, indent = 1, sort_keys = True)
+
+    baseline_results = []
+    if baseline and not update_baseline:
+        try:
+            with open(baseline) as f:
+                baseline_data = json.load(f)
+        except IOError:
+            FreeCAD.Console.PrintWarning("No baseline found at {path}\n".format(path = baseline))
+        else:
+            baseline_results = baseline_data['results']
+            if baseline_data.get('generalFuse') != data['generalFuse']:
+                FreeCAD.Console.PrintWarning("Baseline was made with generalFuse={old}, now it is {new}; "
+                                             "results are not comparable\n"
+                                             .format(old = baseline_data.get('generalFuse'), new = data['generalFuse']))
+    #failures are reported even without a baseline
+    regressions = compare(results, baseline_results, threshold)
+    for record, old in regressions:
+        FreeCAD.Console.PrintError("Regression: {case} size={size} {mode} {connectEngine} refine={refine}: {new} (was {old})\n"
+            .format(new = record.get('time', record.get('error')),
+                    old = old.get('time', old.get('error')) if old else "no baseline", **record))
+    FreeCAD.Console.PrintMessage("{n} regressions\n".format(n = len(regressions)))
+    if baseline and update_baseline:
+        with open(baseline, 'w') as f:
+            json.dump(data, f, indent = 1, sort_keys = True)
+    return regressions
+
+def measureStorage(count = 50, size = 4):
+    '''measureStorage(count = 50, size = 4): saves a document with count bypass
+    joins of perforated plates, with CompactStorage off and on, and returns
+    a dict {False: {'fileSize':..., 'loadTime':...}, True: {...}}.'''
+    tmpdir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for compact in (False, True):
+            doc = FreeCAD.newDocument("JoinFeaturesStorage")
+            for i in range(count):
+                base = doc.addObject("Part::Feature", "Base")
+                base.Shape = makePlate(size)
+                tool = doc.addObject("Part::Feature", "Tool")
+                tool.Shape = Part.makeBox(30, 30, 20, Vector(35,35,-5))
+                obj = JoinFeatures.makePartJoinFeature(name = 'Bypass', mode = 'bypass', doc = doc)
+                obj.Base = base
+                obj.Tool = tool
+                obj.CompactStorage = compact
+                obj.Async = False
+            doc.recompute()
+            path = os.path.join(tmpdir, "storage_{compact}.FCStd".format(compact = compact))
+            doc.saveAs(path)
+            FreeCAD.closeDocument(doc.Name)
+            t = time.time()
+            doc = FreeCAD.openDocument(path)
+            load_time = time.time() - t
+            FreeCAD.closeDocument(doc.Name)
+            results[compact] = {'fileSize': os.path.getsize(path), 'loadTime': load_time}
+            FreeCAD.Console.PrintMessage("CompactStorage={compact}: {fileSize} bytes, loaded in {loadTime} s\n"
+                .format(compact = compact, **results[compact]))
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Benchmark of JoinFeatures recompute time")
+    parser.add_argument('--output', default = 'JoinFeaturesBenchmark.json')
+    parser.add_argument('--baseline', default = None, help = "results file to compare with")
+    parser.add_argument('--update-baseline', action = 'store_true', help = "store results as the new baseline")
+    parser.add_argument('--sizes', default = '1,2,4,8', help = "comma-separated complexity levels")
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--threshold', type = float, default = 1.25, help = "slowdown ratio treated as regression")
+    parser.add_argument('--cases', default = None, help = "comma-separated: " + ",".join(name for name, func in CASES))
+    parser.add_argument('--storage', action = 'store_true', help = "measure file size and load time with CompactStorage off and on, instead")
+    args, unknown = parser.parse_known_args(argv) #FreeCADCmd leaves its own arguments in argv
+    if args.storage:
+        measureStorage()
+        return 0
+    regressions = run(output = args.output,
+                      baseline = args.baseline,
+                      update_baseline = args.update_baseline,
+                      sizes = [int(size) for size in args.sizes.split(',')],
+                      repeat = args.repeat,
+                      threshold = args.threshold,
+                      cases = args.cases.split(',') if args.cases else None)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,159 @@
+#***************************************************************************
+#*                                                                         *
+#*   Copyright (c) 2015 - Victor Titov (DeepSOIC)                          *
+#*                                               <vv.titov@gmail.com>      *  
+#*                                                                         *
+#*   This program is free software; you can redistribute it and/or modify  *
+#*   it under the terms of the GNU Lesser General Public License (LGPL)    *
+#*   as published by the Free Software Foundation; either version 2 of     *
+#*   the License, or (at your option) any later version.                   *
+#*   for detail see the LICENCE text file.                                 *
+#*                                                                         *
+#*   This program is distributed in the hope that it will be useful,       *
+#*   but WITHOUT ANY WARRANTY; without even the implied warranty of        *
+#*   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         *
+#*   GNU Library General Public License for more details.                  *
+#*                                                                         *
+#*   You should have received a copy of the GNU Library General Public     *
+#*   License along with this program; if not, write to the Free Software   *
+#*   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  *
+#*   USA                                                                   *
+#*                                                                         *
+#***************************************************************************
+
+import FreeCAD, FreeCADGui
+from PySide import QtCore, QtGui
+from JoinFeatures import getIconPath
+
+__title__="JoinFeatures GUI commands"
+__author__ = "DeepSOIC"
+__url__ = "http://www.freecadweb.org"
+
+#-------------------------- translation-related code ----------------------------------------
+#Thanks, yorik! (see forum thread "A new Part tool is being born... JoinFeatures!"
+#http://forum.freecadweb.org/viewtopic.php?f=22&t=11112&start=30#p90239 )
+try:
+    _fromUtf8 = QtCore.QString.fromUtf8
+except AttributeError:
+    def _fromUtf8(s):
+        return s
+try:
+    _encoding = QtGui.QApplication.UnicodeUTF8
+    def _translate(context, text, disambig):
+        return QtGui.QApplication.translate(context, text, disambig, _encoding)
+except AttributeError:
+    def _translate(context, text, disambig):
+        return QtGui.QApplication.translate(context, text, disambig)
+#--------------------------/translation-related code ----------------------------------------
+
+# -------------------------- common stuff --------------------------------------------------
+def CreateJoinFeature(name, mode):
+    FreeCAD.ActiveDocument.openTransaction("Create "+mode+"ObjectsFeature")
+    FreeCADGui.addModule("JoinFeatures")
+    FreeCADGui.doCommand("j = JoinFeatures.makePartJoinFeature(name = '"+name+"', mode = '"+mode+"' )")
+    FreeCADGui.doCommand("j.Base = FreeCADGui.Selection.getSelection()[0]")
+    FreeCADGui.doCommand("j.Tool = FreeCADGui.Selection.getSelection()[1]")
+    if len(FreeCADGui.Selection.getSelection()) > 2:
+        FreeCADGui.doCommand("j.Tools = FreeCADGui.Selection.getSelection()[2:]")
+    FreeCADGui.doCommand("j.Proxy.execute(j)")
+    FreeCADGui.doCommand("j.purgeTouched()")
+    FreeCADGui.doCommand("j.Base.ViewObject.hide()")
+    FreeCADGui.doCommand("j.Tool.ViewObject.hide()")
+    FreeCADGui.doCommand("for tool in j.Tools: tool.ViewObject.hide()")
+    FreeCAD.ActiveDocument.commitTransaction()
+
+# -------------------------- /common stuff --------------------------------------------------
+
+# -------------------------- ConnectObjectsFeature --------------------------------------------------
+
+class _CommandConnectFeature:
+    "Command to create PartJoinFeature in Connect mode"
+    def GetResources(self):
+        return {'Pixmap'  : getIconPath("Part-joinConnect.svg"),
+                'MenuText': QtCore.QT_TRANSLATE_NOOP("Part_ConnectFeature","Connect objects..."),
+                'Accel': "",
+                'ToolTip': QtCore.QT_TRANSLATE_NOOP("Part_ConnectFeature","Fuses objects, taking care to preserve voids.")}
+        
+    def Activated(self):
+        if len(FreeCADGui.Selection.getSelection()) >= 2 :
+            CreateJoinFeature(name = "Connect", mode = "Connect")
+        else:
+            mb = QtGui.QMessageBox()
+            mb.setIcon(mb.Icon.Warning)
+            mb.setText(_translate("Part_JoinFeatures", "Two solids need to be selected, first!", None))
+            mb.setWindowTitle(_translate("Part_JoinFeatures","Bad selection", None))
+            mb.exec_()
+            
+    def IsActive(self):
+        if FreeCAD.ActiveDocument:
+            return True
+        else:
+            return False
+            
+FreeCADGui.addCommand('Part_ConnectFeature',_CommandConnectFeature())
+
+# -------------------------- /PartJoinFeature --------------------------------------------------
+
+
+# -------------------------- EmbedFeature --------------------------------------------------
+
+class _CommandEmbedFeature:
+    "Command to create PartJoinFeature in Embed mode"
+    def GetResources(self):
+        return {'Pixmap'  : getIconPath("Part-joinEmbed.svg"),
+                'MenuText': QtCore.QT_TRANSLATE_NOOP("Part_EmbedFeature","Embed object"),
+                'Accel': "",
+                'ToolTip': QtCore.QT_TRANSLATE_NOOP("Part_EmbedFeature","Fuses one object into another, taking care to preserve voids.")}
+        
+    def Activated(self):
+        if len(FreeCADGui.Selection.getSelection()) >= 2 :
+            CreateJoinFeature(name = "Embed", mode = "Embed")
+        else:
+            mb = QtGui.QMessageBox()
+            mb.setIcon(mb.Icon.Warning)
+            mb.setText(_translate("Part_JoinFeatures","Select base object, then the object to embed, and invoke this tool.", None))
+            mb.setWindowTitle(_translate("Part_JoinFeatures","Bad selection", None))
+            mb.exec_()
+
+        
+    def IsActive(self):
+        if FreeCAD.ActiveDocument:
+            return True
+        else:
+            return False
+
+FreeCADGui.addCommand('Part_EmbedFeature',_CommandEmbedFeature())
+
+# -------------------------- /EmbedFeature --------------------------------------------------
+
+
+
+# -------------------------- CutoutFeature --------------------------------------------------
+
+class _CommandCutoutFeature:
+    "Command to create PartJoinFeature in Cutout mode"
+    def GetResources(self):
+        return {'Pixmap'  : getIconPath("Part-joinCutout.svg"),
+                'MenuText': QtCore.QT_TRANSLATE_NOOP("Part_CutoutFeature","Cutout for object"),
+                'Accel': "",
+                'ToolTip': QtCore.QT_TRANSLATE_NOOP("Part_CutoutFeature","Makes a cutout in one object to fit another object.")}
+        
+    def Activated(self):
+        if len(FreeCADGui.Selection.getSelection()) >= 2 :
+            CreateJoinFeature(name = "Cutout", mode = "Cutout")
+        else:
+            mb = QtGui.QMessageBox()
+            mb.setIcon(mb.Icon.Warning)
+            mb.setText(_translate("Part_JoinFeatures","Select the object to make a cutout in, then the object that should fit into the cutout, and invoke this tool.", None))
+            mb.setWindowTitle(_translate("Part_JoinFeatures","Bad selection", None))
+            mb.exec_()
+
+    def IsActive(self):
+        if FreeCAD.ActiveDocument:
+            return True
+        else:
+            return False
+
+FreeCADGui.addCommand('Part_CutoutFeature',_CommandCutoutFeature())
+
+# -------------------------- /CutoutFeature --------------------------------------------------